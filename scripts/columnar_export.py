@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# columnar_export.py - EXPORT/INGEST COLUMNAR (Parquet/Arrow)
+# Cada run se agrega a un dataset Parquet comprimido, particionado por fecha y fuente,
+# para analizar históricos (conteos por fuente, cobertura de imágenes, churn) sin
+# cargar todos los JSON en memoria.
+
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+
+import os
+import json
+import uuid
+from datetime import datetime, date
+from typing import List, Dict, Any, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# ============================================
+# CONFIGURACION
+# ============================================
+
+SCRAPE_DATA_DIR = r"C:\Users\pablo\Downloads\VENUZ-Complete-App\venuz-app\scrape-data"
+CATALOGO_DIR = os.path.join(SCRAPE_DATA_DIR, "catalogo")
+
+# JSON históricos que se pueden ingestar de una. Los scrapers sobreescriben estos
+# archivos en cada run y además exportan el run directo al catálogo, así que al
+# ingestar se descartan los registros que un run ya exportó (ver ingestar_json)
+ARCHIVOS_JSON = ["FINAL_DATA.json", "PORNDUDE_SCRAPED.json", "001_webcams.json", "camsoda_sample.json"]
+
+COMPRESION = "zstd"
+
+# Schema fijo: todos los runs deben escribir los mismos tipos para poder hacer append
+SCHEMA = pa.schema([
+    ("title", pa.string()),
+    ("description", pa.string()),
+    ("image_url", pa.string()),
+    ("source_url", pa.string()),
+    ("affiliate_url", pa.string()),
+    ("category", pa.string()),
+    ("subcategory", pa.string()),
+    ("location", pa.string()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("is_verified", pa.bool_()),
+    ("is_premium", pa.bool_()),
+    ("rating", pa.float64()),
+    ("quality_score", pa.int32()),
+    ("likes", pa.int64()),
+    ("views", pa.int64()),
+    ("active", pa.bool_()),
+    ("created_at", pa.timestamp("us")),
+    ("run_id", pa.string()),
+    # Columnas de partición (hive: run_date=YYYY-MM-DD/affiliate_source=xxx)
+    ("run_date", pa.string()),
+    ("affiliate_source", pa.string()),
+])
+
+PARTICIONES = ds.partitioning(
+    pa.schema([("run_date", pa.string()), ("affiliate_source", pa.string())]),
+    flavor="hive",
+)
+
+# ============================================
+# FUNCIONES HELPER
+# ============================================
+
+def _parse_fecha(valor: Any) -> Optional[datetime]:
+    """ISO string -> datetime (None si no se puede parsear)"""
+    if isinstance(valor, datetime):
+        return valor
+    try:
+        return datetime.fromisoformat(valor) if valor else None
+    except (TypeError, ValueError):
+        return None
+
+def _a_tabla(datos: List[Dict[str, Any]], run_id: str, run_date: str) -> pa.Table:
+    """Registros (dicts) -> tabla Arrow con el schema fijo"""
+    columnas = {}
+    for campo in SCHEMA:
+        if campo.name == "run_id":
+            valores = [run_id] * len(datos)
+        elif campo.name == "run_date":
+            valores = [run_date] * len(datos)
+        elif campo.name == "created_at":
+            valores = [_parse_fecha(d.get("created_at")) for d in datos]
+        elif campo.name == "affiliate_source":
+            valores = [d.get("affiliate_source") or "desconocido" for d in datos]
+        elif campo.name == "source_url":
+            # scraper.py no setea source_url: en la DB se usa affiliate_url (ver insertar_en_supabase)
+            valores = [d.get("source_url") or d.get("affiliate_url") for d in datos]
+        else:
+            valores = [d.get(campo.name) for d in datos]
+        columnas[campo.name] = pa.array(valores, type=campo.type)
+    return pa.Table.from_pydict(columnas, schema=SCHEMA)
+
+# ============================================
+# EXPORT / INGEST
+# ============================================
+
+def exportar_run(datos: List[Dict[str, Any]], base_dir: str = CATALOGO_DIR,
+                 run_date: Optional[str] = None, run_id: Optional[str] = None) -> int:
+    """Agrega los registros de un run al dataset (append, nunca sobreescribe)"""
+    if not datos:
+        return 0
+    run_date = run_date or date.today().isoformat()
+    run_id = run_id or f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    tabla = _a_tabla(datos, run_id, run_date)
+    os.makedirs(base_dir, exist_ok=True)
+    ds.write_dataset(
+        tabla,
+        base_dir,
+        format="parquet",
+        partitioning=PARTICIONES,
+        # Un nombre por run: los runs del mismo día conviven en la misma partición
+        basename_template=f"{run_id}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression=COMPRESION),
+    )
+    return tabla.num_rows
+
+def _urls_exportadas(fecha: str, base_dir: str) -> set:
+    """URLs que runs en vivo (no ingestas de JSON) ya exportaron para esa fecha"""
+    if not os.path.isdir(base_dir):
+        return set()
+    tabla = leer_catalogo(["source_url", "run_id"], ds.field("run_date") == fecha, base_dir)
+    en_vivo = pc.invert(pc.starts_with(tabla["run_id"], "json-"))
+    return set(tabla.filter(en_vivo)["source_url"].to_pylist())
+
+def ingestar_json(path: str, base_dir: str = CATALOGO_DIR) -> int:
+    """
+    Importa un JSON histórico usando la fecha de created_at como partición.
+
+    Es idempotente (mismo run_id por archivo y fecha) y omite los registros que
+    un run en vivo ya exportó ese día, para no contarlos dos veces.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+    if not datos:
+        return 0
+
+    por_fecha: Dict[str, List[Dict[str, Any]]] = {}
+    for d in datos:
+        creado = _parse_fecha(d.get("created_at"))
+        fecha = creado.date().isoformat() if creado else date.today().isoformat()
+        por_fecha.setdefault(fecha, []).append(d)
+
+    nombre = os.path.splitext(os.path.basename(path))[0]
+    total = 0
+    for fecha, registros in por_fecha.items():
+        exportadas = _urls_exportadas(fecha, base_dir)
+        registros = [d for d in registros if (d.get("source_url") or d.get("affiliate_url")) not in exportadas]
+        total += exportar_run(registros, base_dir, run_date=fecha, run_id=f"json-{nombre}-{fecha}")
+    return total
+
+# ============================================
+# LECTURA
+# ============================================
+
+def abrir_catalogo(base_dir: str = CATALOGO_DIR) -> ds.Dataset:
+    """Dataset Arrow lazy sobre todos los runs"""
+    return ds.dataset(base_dir, format="parquet", partitioning=PARTICIONES, schema=SCHEMA)
+
+def leer_catalogo(columnas: Optional[List[str]] = None, filtro: Optional[ds.Expression] = None,
+                  base_dir: str = CATALOGO_DIR) -> pa.Table:
+    """
+    Lee el catálogo con proyección y predicate pushdown.
+
+    Los filtros sobre run_date/affiliate_source descartan particiones enteras;
+    el resto usa las estadísticas de row-group de Parquet. Ejemplo:
+
+        leer_catalogo(["title", "image_url"],
+                      (ds.field("affiliate_source") == "porndude") & (ds.field("run_date") >= "2026-01-01"))
+    """
+    return abrir_catalogo(base_dir).to_table(columns=columnas, filter=filtro)
+
+def conteo_por_fuente(base_dir: str = CATALOGO_DIR) -> pa.Table:
+    """Registros por (run_date, affiliate_source) leyendo solo las columnas de partición"""
+    tabla = leer_catalogo(["run_date", "affiliate_source"], base_dir=base_dir)
+    return tabla.group_by(["run_date", "affiliate_source"]).aggregate([("run_date", "count")])
+
+def cobertura_imagenes(base_dir: str = CATALOGO_DIR) -> pa.Table:
+    """% de registros con imagen que no es placeholder de Unsplash, por fuente"""
+    tabla = leer_catalogo(["affiliate_source", "image_url"], base_dir=base_dir)
+    real = pc.invert(pc.fill_null(pc.match_substring(tabla["image_url"], "images.unsplash.com"), True))
+    tabla = tabla.append_column("imagen_real", pc.cast(real, pa.int64()))
+    return tabla.group_by("affiliate_source").aggregate([("imagen_real", "mean")])
+
+# ============================================
+# MAIN EXECUTION
+# ============================================
+
+def main():
+    """Ingesta los JSON indicados (o los históricos por defecto) al catálogo"""
+    archivos = sys.argv[1:] or [os.path.join(SCRAPE_DATA_DIR, a) for a in ARCHIVOS_JSON]
+    for archivo in archivos:
+        if not os.path.exists(archivo):
+            print(f"⏩ No existe: {archivo}")
+            continue
+        total = ingestar_json(archivo)
+        print(f"💾 {total} registros de {os.path.basename(archivo)} -> {CATALOGO_DIR}")
+
+    print("\n📊 Registros por fuente:")
+    print(conteo_por_fuente())
+
+if __name__ == "__main__":
+    main()
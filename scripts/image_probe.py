@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# image_probe.py - VALIDACIÓN CONCURRENTE DE image_url
+# Descarga solo los primeros KB de cada imagen (Range request) para leer tipo,
+# dimensiones y tamaño. Los resultados quedan en un cache SQLite con TTL para no
+# volver a probar URLs conocidas en cada run (seguro con varios workers a la vez).
+
+import os
+import json
+import struct
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import requests
+
+from quality_score import es_imagen_placeholder
+
+# ============================================
+# CONFIGURACION
+# ============================================
+
+SCRAPE_DATA_DIR = r"C:\Users\pablo\Downloads\VENUZ-Complete-App\venuz-app\scrape-data"
+CACHE_FILE = os.path.join(SCRAPE_DATA_DIR, "image_probe_cache.db")
+
+BYTES_PROBE = 16 * 1024          # Suficiente para el header de JPEG/PNG/GIF/WEBP
+TTL_OK = 7 * 24 * 3600           # Imágenes válidas: re-probar cada semana
+TTL_ERROR = 24 * 3600            # Rotas: re-probar al día siguiente
+TTL_TRANSITORIO = 3600           # Timeouts, 5xx, 429, 403: re-probar en el próximo run
+
+# Solo estos status son definitivos; el resto (5xx, 429, 403 por hotlink...) es transitorio
+STATUS_ROTA = (404, 410)
+
+MAX_WORKERS = 32
+TIMEOUT = 10
+
+MIN_LADO = 100                   # Menos que esto es un thumbnail/pixel, no sirve para el feed
+FALLBACK_IMAGE = "https://images.unsplash.com/photo-1557682250-33bd709cbe85?w=800&q=80"
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+    'Range': f'bytes=0-{BYTES_PROBE - 1}',
+}
+
+# ============================================
+# DIMENSIONES DESDE EL HEADER
+# ============================================
+
+def leer_dimensiones(data: bytes) -> Optional[Tuple[int, int]]:
+    """(ancho, alto) leyendo solo los bytes iniciales de PNG/GIF/JPEG/WEBP"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            ancho, alto = struct.unpack("<HH", data[26:30])
+            return ancho & 0x3FFF, alto & 0x3FFF
+        if chunk == b"VP8L":
+            b = data[21:25]
+            ancho = 1 + (((b[1] & 0x3F) << 8) | b[0])
+            alto = 1 + (((b[3] & 0x0F) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+            return ancho, alto
+        if chunk == b"VP8X":
+            ancho = 1 + int.from_bytes(data[24:27], "little")
+            alto = 1 + int.from_bytes(data[27:30], "little")
+            return ancho, alto
+
+    if data[:2] == b"\xff\xd8":
+        # Recorrer segmentos JPEG hasta el SOFn
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            largo = struct.unpack(">H", data[i + 2:i + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                alto, ancho = struct.unpack(">HH", data[i + 5:i + 9])
+                return ancho, alto
+            i += 2 + largo
+    return None
+
+# ============================================
+# CACHE
+# ============================================
+
+class ProbeCache:
+    """
+    Cache URL -> metadata con TTL, persistido en SQLite (WAL). Cada guardar()
+    hace upsert solo de las URLs probadas en este run, así varios procesos
+    pueden compartir el archivo sin pisarse las entradas.
+    """
+
+    def __init__(self, path: str = CACHE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.nuevas: Dict[str, Dict[str, Any]] = {}
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS probes (
+                   url        TEXT PRIMARY KEY,
+                   entrada    TEXT NOT NULL,
+                   checked_at REAL NOT NULL
+               )"""
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Entrada vigente o None si no existe / expiró"""
+        entrada = self.nuevas.get(url)
+        if entrada is None:
+            fila = self.conn.execute("SELECT entrada FROM probes WHERE url = ?", (url,)).fetchone()
+            if fila is None:
+                return None
+            entrada = json.loads(fila[0])
+        if entrada.get("ok"):
+            ttl = TTL_OK
+        elif entrada.get("transitorio"):
+            ttl = TTL_TRANSITORIO
+        else:
+            ttl = TTL_ERROR
+        if time.time() - entrada.get("checked_at", 0) > ttl:
+            return None
+        return entrada
+
+    def set(self, url: str, entrada: Dict[str, Any]):
+        with self.lock:
+            self.nuevas[url] = entrada
+
+    def guardar(self):
+        """Upsert de las entradas nuevas; si otro proceso guardó una más reciente, se conserva"""
+        with self.lock:
+            filas = [(url, json.dumps(e, ensure_ascii=False), e.get("checked_at", 0))
+                     for url, e in self.nuevas.items()]
+            self.nuevas = {}
+        if not filas:
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                """INSERT INTO probes (url, entrada, checked_at) VALUES (?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET entrada = excluded.entrada, checked_at = excluded.checked_at
+                   WHERE excluded.checked_at >= probes.checked_at""",
+                filas,
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+# ============================================
+# PROBE
+# ============================================
+
+_local = threading.local()
+
+def _session() -> requests.Session:
+    """Una Session por thread (keep-alive sin compartir conexiones entre threads)"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+        _local.session.headers.update(HEADERS)
+    return _local.session
+
+def probar_imagen(url: str) -> Dict[str, Any]:
+    """Probe de una URL: status, content_type, dimensiones, tamaño y flags"""
+    resultado = {
+        "ok": False,
+        "transitorio": False,   # Falla que no prueba que la imagen esté rota: no reemplazar
+        "status": None,
+        "content_type": None,
+        "width": None,
+        "height": None,
+        "size": None,
+        "placeholder": es_imagen_placeholder(url),
+        "error": None,
+        "checked_at": time.time(),
+    }
+    if not url or not url.startswith("http"):
+        # data: URIs de lazy-load, src relativos o vacíos
+        resultado["error"] = "url_invalida"
+        return resultado
+
+    try:
+        with _session().get(url, timeout=TIMEOUT, stream=True, allow_redirects=True) as r:
+            resultado["status"] = r.status_code
+            resultado["content_type"] = (r.headers.get("Content-Type") or "").split(";")[0].strip()
+            # Content-Range: bytes 0-16383/123456 -> tamaño total real
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                resultado["size"] = int(total)
+            elif r.headers.get("Content-Length", "").isdigit():
+                resultado["size"] = int(r.headers["Content-Length"])
+
+            if r.status_code not in (200, 206):
+                resultado["error"] = f"http_{r.status_code}"
+                resultado["transitorio"] = r.status_code not in STATUS_ROTA
+                return resultado
+
+            data = b""
+            for chunk in r.iter_content(chunk_size=4096):
+                data += chunk
+                if len(data) >= BYTES_PROBE:
+                    break
+    except Exception as e:
+        # Timeout, conexión caída, DNS...: no dice nada de la imagen
+        resultado["error"] = type(e).__name__
+        resultado["transitorio"] = True
+        return resultado
+
+    dims = leer_dimensiones(data)
+    if dims:
+        resultado["width"], resultado["height"] = dims
+
+    if not resultado["content_type"].startswith("image/") and not dims:
+        resultado["error"] = "no_es_imagen"
+    elif dims and min(dims) < MIN_LADO:
+        resultado["error"] = "muy_chica"
+    else:
+        resultado["ok"] = True
+    return resultado
+
+def probar_imagenes(urls: List[str], cache: Optional[ProbeCache] = None,
+                    max_workers: int = MAX_WORKERS) -> Dict[str, Dict[str, Any]]:
+    """Probe concurrente de URLs únicas, usando el cache para las ya conocidas"""
+    cache = cache or ProbeCache()
+    resultados: Dict[str, Dict[str, Any]] = {}
+    pendientes = []
+    for url in dict.fromkeys(urls):
+        entrada = cache.get(url)
+        if entrada is not None:
+            resultados[url] = entrada
+        else:
+            pendientes.append(url)
+
+    print(f"🖼️ Imágenes: {len(resultados)} en cache, {len(pendientes)} por probar")
+    if pendientes:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for url, resultado in zip(pendientes, pool.map(probar_imagen, pendientes)):
+                cache.set(url, resultado)
+                resultados[url] = resultado
+    return resultados
+
+def validar_imagenes(datos: List[Dict[str, Any]], cache: Optional[ProbeCache] = None,
+                     reemplazar: bool = True) -> Dict[str, int]:
+    """
+    Valida image_url de todos los registros en bulk.
+
+    Marca cada registro con image_ok / image_transitorio / image_placeholder /
+    image_width / image_height y, si `reemplazar`, cambia por FALLBACK_IMAGE solo
+    las imágenes con resultado definitivo (404/410, no es imagen, muy chica).
+    Las fallas transitorias conservan su URL para no pisar valores buenos en la DB.
+    Devuelve conteos para el reporte.
+    """
+    propio = cache is None
+    cache = cache or ProbeCache()
+    try:
+        resultados = probar_imagenes([d.get("image_url") or "" for d in datos], cache)
+        try:
+            cache.guardar()
+        except sqlite3.Error as e:
+            # Los resultados ya están en memoria: no perder la validación del batch
+            print(f"⚠️ No se pudo guardar el cache de imágenes ({e})")
+    finally:
+        if propio:
+            cache.close()
+
+    stats = {"ok": 0, "rotas": 0, "transitorias": 0, "placeholder": 0, "reemplazadas": 0}
+    for d in datos:
+        resultado = resultados[d.get("image_url") or ""]
+        d["image_ok"] = resultado["ok"]
+        d["image_transitorio"] = resultado.get("transitorio", False)
+        d["image_placeholder"] = resultado["placeholder"]
+        d["image_width"] = resultado["width"]
+        d["image_height"] = resultado["height"]
+
+        if resultado["placeholder"]:
+            stats["placeholder"] += 1
+        if resultado["ok"]:
+            stats["ok"] += 1
+            continue
+        if d["image_transitorio"]:
+            stats["transitorias"] += 1
+            continue
+        stats["rotas"] += 1
+        if reemplazar and d.get("image_url") != FALLBACK_IMAGE:
+            d["image_url"] = FALLBACK_IMAGE
+            d["image_placeholder"] = True
+            stats["reemplazadas"] += 1
+    return stats
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# near_dedup.py - DEDUPLICACIÓN DE CASI-DUPLICADOS (MinHash + LSH)
+# El mismo sitio aparece con distintos redirects, categorías (general/tubes/webcam)
+# y títulos apenas diferentes. Aquí se detectan por similitud de Jaccard estimada
+# con MinHash, usando un índice LSH por bandas para no comparar todo contra todo.
+
+import os
+import re
+import zlib
+from urllib.parse import urlparse
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from quality_score import (
+    normalizar_texto, extraer_dominio, es_imagen_placeholder, calcular_quality_scores, DOMINIOS_AGREGADORES,
+)
+
+# ============================================
+# CONFIGURACION
+# ============================================
+
+NUM_PERM = 128          # Funciones hash por firma
+NUM_BANDAS = 32         # Bandas LSH (NUM_PERM / NUM_BANDAS filas por banda)
+UMBRAL_JACCARD = 0.8    # Similitud mínima para considerar casi-duplicado
+SEMILLA = 1337          # Fija: las firmas deben ser estables entre runs
+
+PRIMO = (1 << 31) - 1   # a*x + b cabe en uint64 sin overflow
+MAX_HASH = np.uint64(PRIMO)
+
+# Palabras de las descripciones plantilla ("Discover X - Premium live cam experience")
+# que no aportan nada para distinguir sitios
+PALABRAS_PLANTILLA = {
+    "discover", "explore", "visit", "premium", "live", "cam", "cams",
+    "experience", "top", "rated", "adult", "entertainment", "best", "site",
+}
+
+POLITICAS = ("primero", "mejor", "fusionar")
+
+# ============================================
+# FIRMAS
+# ============================================
+
+def _dominio_sitio(record: Dict[str, Any]) -> str:
+    """
+    Dominio destino si el registro resolvió a la home de un sitio real, '' si no.
+    Dos redirects que resuelven al mismo sitio son el mismo sitio aunque el título
+    difiera ("Stripchat" / "Stripchat Live"); las subpáginas (modelos) no cuentan.
+    """
+    url = record.get("affiliate_url") or record.get("source_url") or ""
+    dominio = extraer_dominio(url)
+    if dominio in DOMINIOS_AGREGADORES or urlparse(url).path not in ("", "/"):
+        return ""
+    return dominio
+
+def _shingles(record: Dict[str, Any]) -> List[str]:
+    """Trigramas de caracteres del título + dominio + palabras útiles de la descripción"""
+    titulo = normalizar_texto(record.get("title", "")).replace(" ", "")
+    # Solo el dominio destino de una home: los redirects /go/ comparten dominio
+    # agregador y las subpáginas (modelos) comparten plataforma, sin ser el mismo sitio
+    dominio = _dominio_sitio(record)
+    dominio_base = re.sub(r"\.[a-z]{2,}$", "", dominio)
+
+    tokens = {f"t:{titulo[i:i + 3]}" for i in range(max(len(titulo) - 2, 1))} if titulo else set()
+    if dominio_base:
+        # El nombre del dominio suele coincidir con el título ("sweepsex" / SweepSex)
+        tokens.update(f"t:{dominio_base[i:i + 3]}" for i in range(max(len(dominio_base) - 2, 1)))
+        tokens.add(f"d:{dominio}")
+    for palabra in normalizar_texto(record.get("description", "")).split():
+        if palabra not in PALABRAS_PLANTILLA and len(palabra) > 2:
+            tokens.add(f"w:{palabra}")
+    return sorted(tokens)
+
+class MinHasher:
+    """Genera firmas MinHash con hashing universal (a*x + b) mod p"""
+
+    def __init__(self, num_perm: int = NUM_PERM, semilla: int = SEMILLA):
+        rng = np.random.RandomState(semilla)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, PRIMO, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, PRIMO, size=num_perm).astype(np.uint64)
+
+    def firma(self, record: Dict[str, Any]) -> np.ndarray:
+        """Firma (num_perm,) de un registro; vacía = todo MAX_HASH"""
+        shingles = _shingles(record)
+        if not shingles:
+            return np.full(self.num_perm, PRIMO, dtype=np.uint32)
+        # crc32 (no hash()) para que las firmas sobrevivan entre procesos
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        h %= MAX_HASH
+        # Los valores quedan < 2^31: se guardan como uint32
+        return ((self.a[:, None] * h[None, :] + self.b[:, None]) % MAX_HASH).min(axis=1).astype(np.uint32)
+
+# ============================================
+# ÍNDICE LSH
+# ============================================
+
+class LSHIndex:
+    """
+    Índice LSH por bandas sobre firmas MinHash, persistible en .npz.
+
+    Cada banda se reduce a una clave uint64 (hash de sus filas con el número de
+    banda en los bits altos). Lo cargado del disco queda como matriz de firmas +
+    claves ordenadas (búsqueda con searchsorted, se arman vectorizadas); lo
+    agregado después va a buckets en un dict.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bandas: int = NUM_BANDAS,
+                 umbral: float = UMBRAL_JACCARD):
+        if num_perm % num_bandas != 0:
+            raise ValueError("num_perm debe ser múltiplo de num_bandas")
+        self.hasher = MinHasher(num_perm)
+        self.num_bandas = num_bandas
+        self.filas = num_perm // num_bandas
+        self.umbral = umbral
+        # Multiplicadores impares para combinar las filas de una banda en un uint64
+        rng = np.random.RandomState(SEMILLA + 1)
+        self.mezcla = rng.randint(1, PRIMO, size=self.filas).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+        bits = max((num_bandas - 1).bit_length(), 1)
+        self.corrimiento = np.uint64(bits)
+        self.prefijos = np.arange(num_bandas, dtype=np.uint64) << np.uint64(64 - bits)
+
+        self.keys: List[str] = []
+        self.posiciones: Dict[str, int] = {}    # key -> idx (las keys son únicas)
+        self.sitios: List[str] = []             # dominio destino por idx ('' si no es una home)
+        self.por_sitio: Dict[str, int] = {}     # dominio destino -> primer idx
+
+        # Parte cargada: firmas (m, num_perm) y claves de banda ordenadas + su idx
+        self.firmas_base = np.zeros((0, num_perm), dtype=np.uint32)
+        self.claves_ordenadas = np.zeros(0, dtype=np.uint64)
+        self.idx_ordenados = np.zeros(0, dtype=np.int64)
+        # Parte agregada en este proceso
+        self.firmas: List[np.ndarray] = []
+        self.buckets: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.posiciones
+
+    def _claves(self, firmas: np.ndarray) -> np.ndarray:
+        """(n, num_perm) -> (n, num_bandas) claves uint64; el overflow de uint64 es intencional"""
+        filas = firmas.reshape(len(firmas), self.num_bandas, self.filas).astype(np.uint64)
+        hashes = (filas * self.mezcla).sum(axis=2, dtype=np.uint64)
+        return (hashes >> self.corrimiento) | self.prefijos
+
+    def agregar(self, key: str, firma: np.ndarray, sitio: str = "") -> int:
+        """Agrega una firma y devuelve su posición; una key ya indexada no se duplica"""
+        if key in self.posiciones:
+            return self.posiciones[key]
+        idx = len(self.keys)
+        self.keys.append(key)
+        self.posiciones[key] = idx
+        self.sitios.append(sitio)
+        if sitio:
+            self.por_sitio.setdefault(sitio, idx)
+        self.firmas.append(firma.astype(np.uint32))
+        for clave in self._claves(firma[None, :])[0].tolist():
+            self.buckets.setdefault(clave, []).append(idx)
+        return idx
+
+    def _firmas_de(self, idxs: np.ndarray) -> np.ndarray:
+        base = len(self.firmas_base)
+        if not self.firmas:
+            return self.firmas_base[idxs]
+        todas = [self.firmas_base[i] if i < base else self.firmas[i - base] for i in idxs.tolist()]
+        return np.stack(todas)
+
+    def buscar(self, firma: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Mejor candidato (idx, jaccard estimado) sobre el umbral, o None"""
+        claves = self._claves(firma[None, :])[0]
+        candidatos = set()
+        if len(self.claves_ordenadas):
+            desde = np.searchsorted(self.claves_ordenadas, claves, side="left")
+            hasta = np.searchsorted(self.claves_ordenadas, claves, side="right")
+            for d, h in zip(desde[hasta > desde].tolist(), hasta[hasta > desde].tolist()):
+                candidatos.update(self.idx_ordenados[d:h].tolist())
+        for clave in claves.tolist():
+            candidatos.update(self.buckets.get(clave, ()))
+        if not candidatos:
+            return None
+
+        idxs = np.fromiter(candidatos, dtype=np.int64, count=len(candidatos))
+        similitud = (self._firmas_de(idxs) == firma.astype(np.uint32)[None, :]).mean(axis=1)
+        mejor = int(similitud.argmax())
+        if similitud[mejor] < self.umbral:
+            return None
+        return int(idxs[mejor]), float(similitud[mejor])
+
+    def guardar(self, path: str):
+        """
+        Persiste keys + sitios + firmas (uint32, sin comprimir: son casi aleatorias);
+        las claves de banda se recalculan vectorizadas al cargar.
+        """
+        nuevas = np.array(self.firmas, dtype=np.uint32).reshape(-1, self.hasher.num_perm)
+        firmas = np.concatenate([self.firmas_base, nuevas])
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            keys=np.array(self.keys, dtype=str),
+            sitios=np.array(self.sitios, dtype=str),
+            firmas=firmas,
+            config=np.array([self.hasher.num_perm, self.num_bandas]),
+            umbral=np.array(self.umbral),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def cargar(cls, path: str, umbral: Optional[float] = None) -> "LSHIndex":
+        """Carga un índice guardado; si no existe devuelve uno vacío"""
+        if not os.path.exists(path):
+            return cls(umbral=umbral if umbral is not None else UMBRAL_JACCARD)
+        with np.load(path) as data:
+            num_perm, num_bandas = (int(x) for x in data["config"])
+            index = cls(num_perm, num_bandas, umbral if umbral is not None else float(data["umbral"]))
+            keys = data["keys"].tolist()
+            # Índices guardados antes de indexar el sitio destino: sin sitios
+            sitios = data["sitios"].tolist() if "sitios" in data.files else [""] * len(keys)
+            # Los índices viejos guardaban uint64; los valores siempre son < 2^31
+            firmas = data["firmas"].astype(np.uint32)
+
+        index.keys = keys
+        index.sitios = sitios
+        # Recorridos al revés: ante keys repetidas (índices viejos) gana el primer idx
+        index.posiciones = dict(zip(reversed(keys), range(len(keys) - 1, -1, -1)))
+        index.por_sitio = {s: i for s, i in zip(reversed(sitios), range(len(sitios) - 1, -1, -1)) if s}
+        index.firmas_base = firmas
+        if len(firmas):
+            claves = index._claves(firmas).ravel()
+            orden = np.argsort(claves)
+            index.claves_ordenadas = claves[orden]
+            index.idx_ordenados = orden // index.num_bandas
+        return index
+
+# ============================================
+# POLÍTICAS DE MERGE
+# ============================================
+
+def _fusionar(base: Dict[str, Any], otro: Dict[str, Any]) -> Dict[str, Any]:
+    """Completa campos vacíos (o imagen placeholder) de `base` con los de `otro`"""
+    for campo, valor in otro.items():
+        if valor in (None, "") or campo in ("source_url", "affiliate_url"):
+            continue
+        if base.get(campo) in (None, ""):
+            base[campo] = valor
+        elif campo == "image_url" and es_imagen_placeholder(base[campo]) and not es_imagen_placeholder(valor):
+            base[campo] = valor
+    return base
+
+def _resolver(actual: Dict[str, Any], nuevo: Dict[str, Any], politica: str,
+              puntajes: Dict[int, int]) -> Dict[str, Any]:
+    """Decide qué registro sobrevive dentro de un cluster"""
+    if politica == "primero":
+        return actual
+    ganador, perdedor = actual, nuevo
+    if puntajes.get(id(nuevo), 0) > puntajes.get(id(actual), 0):
+        ganador, perdedor = nuevo, actual
+        # Mantener la URL canónica del cluster para que el upsert pegue en la misma fila
+        ganador["source_url"] = actual["source_url"]
+    if politica == "fusionar":
+        _fusionar(ganador, perdedor)
+    return ganador
+
+# ============================================
+# API PRINCIPAL
+# ============================================
+
+def deduplicar_near(datos: List[Dict[str, Any]], index: Optional[LSHIndex] = None,
+                    politica: str = "fusionar") -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Elimina casi-duplicados de `datos` (dentro del batch y contra runs previos).
+
+    Políticas:
+      - primero:  se queda el primer registro visto del cluster
+      - mejor:    se queda el de mayor quality_score (calculado sobre el batch)
+      - fusionar: como `mejor`, completando campos vacíos con los duplicados
+
+    Un source_url ya indexado, o un affiliate_url que resolvió a la home de un
+    sitio ya indexado, tiene prioridad sobre el match LSH (el título puede haber
+    cambiado). Si un registro coincide con uno de un run previo, hereda su
+    source_url para que el upsert (on_conflict='source_url') actualice la fila
+    existente; nunca salen dos registros con el mismo source_url.
+    Devuelve (registros_unicos, cantidad_de_duplicados).
+
+    Los puntajes para `mejor`/`fusionar` se calculan aquí sobre el batch de entrada
+    y no se escriben en los registros: hay que aplicar_quality_scores() sobre los
+    sobrevivientes después, porque la fusión cambia sus campos.
+    """
+    if politica not in POLITICAS:
+        raise ValueError(f"Política desconocida: {politica} (opciones: {', '.join(POLITICAS)})")
+    if index is None:
+        index = LSHIndex()
+
+    puntajes: Dict[int, int] = {}
+    if politica != "primero" and datos:
+        puntajes = dict(zip(map(id, datos), calcular_quality_scores(datos).tolist()))
+
+    unicos: List[Dict[str, Any]] = []
+    posicion: Dict[int, int] = {}   # idx en el índice -> posición en `unicos`
+    duplicados = 0
+
+    for record in datos:
+        sitio = _dominio_sitio(record)
+        # Match exacto (misma URL o mismo sitio destino) antes que el match LSH
+        idx = index.posiciones.get(record["source_url"])
+        if idx is None and sitio:
+            idx = index.por_sitio.get(sitio)
+        if idx is None:
+            firma = index.hasher.firma(record)
+            match = index.buscar(firma)
+            if match is None:
+                posicion[index.agregar(record["source_url"], firma, sitio)] = len(unicos)
+                unicos.append(record)
+                continue
+            idx, _ = match
+
+        if idx not in posicion:
+            # Misma URL o casi-duplicado de un run anterior: reusar su URL canónica
+            record["source_url"] = index.keys[idx]
+            posicion[idx] = len(unicos)
+            unicos.append(record)
+        else:
+            pos = posicion[idx]
+            unicos[pos] = _resolver(unicos[pos], record, politica, puntajes)
+            duplicados += 1
+
+    return unicos, duplicados
+
+def indexar(datos: List[Dict[str, Any]], index: LSHIndex) -> int:
+    """Agrega al índice los registros cuyo source_url todavía no está; devuelve cuántos"""
+    nuevos = 0
+    for record in datos:
+        if record["source_url"] not in index:
+            index.agregar(record["source_url"], index.hasher.firma(record), _dominio_sitio(record))
+            nuevos += 1
+    return nuevos
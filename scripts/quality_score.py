@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# quality_score.py - SCORING DE CALIDAD EN BATCH (NumPy + pyarrow.compute)
+# Calcula quality_score (0-100) para todo el set de registros antes del upsert,
+# así el score viaja en el mismo batch y la DB no tiene que recalcularlo fila por fila.
+
+import re
+from typing import List, Dict, Any
+from urllib.parse import urlparse
+
+import numpy as np
+
+# pyarrow solo lo usa calcular_features (kernels de texto); image_probe y near_dedup
+# importan los helpers escalares de este módulo y no deberían depender de él
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+# ============================================
+# CONFIGURACION
+# ============================================
+
+# Pesos de cada feature (suman 100)
+PESOS = {
+    "titulo_largo": 20,
+    "titulo_calidad": 20,
+    "imagen": 25,
+    "dominio": 20,
+    "unicidad": 15,
+}
+
+# Rango ideal de longitud de título (caracteres)
+TITULO_MIN = 4
+TITULO_IDEAL_MIN = 8
+TITULO_IDEAL_MAX = 60
+TITULO_MAX = 100
+
+# Títulos genéricos que usan los scrapers como fallback
+TITULOS_GENERICOS = {
+    "adult site",
+    "cam site",
+    "live cam site",
+    "live cams",
+    "live",
+    "more",
+    "visit",
+    "visit site",
+}
+
+# Hosts de imágenes placeholder (fallbacks de Unsplash, pixel trackers, etc.)
+HOSTS_PLACEHOLDER = (
+    "images.unsplash.com",
+    "via.placeholder.com",
+    "placehold.co",
+    "placehold.it",
+)
+PATRON_PLACEHOLDER = re.compile(r"(placeholder|blank|spacer|pixel|1x1|data:image)", re.IGNORECASE)
+
+# Reputación por dominio destino (0-1). Desconocidos y agregadores usan el default.
+REPUTACION_DOMINIOS = {
+    "camsoda.com": 0.9,
+    "stripchat.com": 0.9,
+    "chaturbate.com": 0.9,
+    "bongacams.com": 0.85,
+    "livejasmin.com": 0.85,
+    "myfreecams.com": 0.85,
+    "cam4.com": 0.8,
+}
+REPUTACION_DEFAULT = 0.6
+
+# Dominios agregadores/redirect: no dicen nada del sitio destino, se tratan
+# como dominio desconocido (reputación default, sin densidad de duplicados)
+DOMINIOS_AGREGADORES = {"theporndude.com", "pdude.link"}
+
+# Sufijos de redirect de PornDude: https://theporndude.com/out/<dominio>
+PATRON_OUT = re.compile(r"/(?:out|go|visit)/([a-z0-9.-]+\.[a-z]{2,})", re.IGNORECASE)
+
+# ============================================
+# FUNCIONES HELPER
+# ============================================
+
+def normalizar_texto(texto: str) -> str:
+    """Lowercase, sin caracteres especiales ni espacios extra"""
+    texto = (texto or "").lower()
+    texto = re.sub(r"[^a-z0-9\s]", " ", texto)
+    return re.sub(r"\s+", " ", texto).strip()
+
+def extraer_dominio(url: str) -> str:
+    """Dominio base de una URL (resuelve /out/<dominio> de PornDude sin hacer requests)"""
+    if not url:
+        return ""
+    match = PATRON_OUT.search(url)
+    if match:
+        dominio = match.group(1).lower()
+    else:
+        dominio = urlparse(url).netloc.lower()
+    dominio = dominio.split(":")[0]
+    if dominio.startswith("www."):
+        dominio = dominio[4:]
+    return dominio
+
+def es_imagen_placeholder(url: str) -> bool:
+    """True si la URL es un placeholder conocido o un pixel vacío"""
+    if not url:
+        return True
+    host = urlparse(url).netloc.lower()
+    return host in HOSTS_PLACEHOLDER or bool(PATRON_PLACEHOLDER.search(url))
+
+# ============================================
+# FEATURES VECTORIZADAS
+# ============================================
+
+# Equivalentes RE2 de extraer_dominio / urlparse para los kernels de pyarrow.compute
+REGEX_HOST = r"^[a-zA-Z][a-zA-Z0-9+.-]*://(?:[^/?#@]*@)?(?P<host>[^/?#]*)"
+REGEX_HOME = r"^[a-zA-Z][a-zA-Z0-9+.-]*://[^/?#]*/?(?:[?#]|$)"
+REGEX_HOST_PLACEHOLDER = (
+    r"^[a-zA-Z][a-zA-Z0-9+.-]*://(?:[^/?#@]*@)?(?:"
+    + "|".join(re.escape(h) for h in HOSTS_PLACEHOLDER)
+    + r")(?:[/?#]|$)"
+)
+REGEX_OUT = r"(?i)/(?:out|go|visit)/(?P<dominio>[a-z0-9.-]+\.[a-z]{2,})"
+
+def _normalizar(textos):
+    """normalizar_texto() sobre un array de strings con kernels de Arrow"""
+    # Un solo reemplazo por tramo: los espacios también colapsan a " "
+    textos = pc.replace_substring_regex(pc.utf8_lower(textos), r"[^a-z0-9]+", " ")
+    return pc.utf8_trim_whitespace(textos)
+
+def _hosts(urls):
+    """Host en minúsculas de cada URL (urlparse().netloc); vacío si no tiene esquema"""
+    host = pc.struct_field(pc.extract_regex(urls, REGEX_HOST), "host")
+    return pc.utf8_lower(pc.fill_null(host, ""))
+
+def _dominios(urls, hosts):
+    """extraer_dominio() vectorizado: /out/<dominio> de PornDude o el host, sin puerto ni www."""
+    redirect = pc.utf8_lower(pc.struct_field(pc.extract_regex(urls, REGEX_OUT), "dominio"))
+    dominios = pc.coalesce(redirect, hosts)
+    dominios = pc.replace_substring_regex(dominios, r":.*$", "")
+    return pc.replace_substring_regex(dominios, r"^www\.", "")
+
+def _a_numpy(array) -> np.ndarray:
+    return array.to_numpy(zero_copy_only=False)
+
+def _score_largo_titulo(largos: np.ndarray) -> np.ndarray:
+    """1.0 dentro del rango ideal, rampa lineal hacia los extremos"""
+    subida = np.clip((largos - TITULO_MIN) / (TITULO_IDEAL_MIN - TITULO_MIN), 0.0, 1.0)
+    bajada = np.clip((TITULO_MAX - largos) / (TITULO_MAX - TITULO_IDEAL_MAX), 0.0, 1.0)
+    return np.minimum(subida, bajada)
+
+def _score_calidad_titulo(titulos, normalizados, largos: np.ndarray) -> np.ndarray:
+    """Penaliza títulos genéricos, en MAYÚSCULAS o con pocos caracteres alfabéticos"""
+    genericos = _a_numpy(pc.is_in(normalizados, value_set=pa.array(sorted(TITULOS_GENERICOS))))
+    letras = _a_numpy(pc.utf8_length(pc.replace_substring_regex(titulos, r"\PL+", ""))).astype(np.float64)
+    mayusculas = _a_numpy(pc.utf8_is_upper(titulos)) & (largos > 4)
+
+    ratio_letras = np.divide(letras, largos, out=np.zeros(len(largos)), where=largos > 0)
+    score = np.clip(ratio_letras / 0.6, 0.0, 1.0)
+    score = np.where(mayusculas, score * 0.7, score)
+    return np.where(genericos, 0.0, score)
+
+def _score_imagen(urls) -> np.ndarray:
+    """1.0 imagen real, 0.3 placeholder, 0.0 sin imagen"""
+    presente = _a_numpy(pc.not_equal(urls, ""))
+    placeholder = _a_numpy(pc.or_(
+        pc.match_substring_regex(urls, REGEX_HOST_PLACEHOLDER, ignore_case=True),
+        pc.match_substring_regex(urls, PATRON_PLACEHOLDER.pattern, ignore_case=True),
+    ))
+    return np.where(~presente, 0.0, np.where(placeholder, 0.3, 1.0))
+
+def _score_dominio(dominios_unicos: List[str], inverso: np.ndarray) -> np.ndarray:
+    """Lookup de reputación sobre dominios únicos y broadcast al set completo"""
+    reputacion = np.array(
+        [REPUTACION_DOMINIOS.get(d, REPUTACION_DEFAULT) for d in dominios_unicos],
+        dtype=np.float64,
+    )
+    return reputacion[inverso]
+
+def _score_unicidad(inv_titulo: np.ndarray, inv_dominio: np.ndarray, sitios: np.ndarray) -> np.ndarray:
+    """
+    Penaliza densidad de duplicados: cuántos registros comparten título normalizado,
+    o apuntan a la home del mismo dominio destino. Los dominios vacíos/agregadores y
+    las subpáginas no cuentan (todos los links /go/ de PornDude comparten dominio,
+    y los modelos de CamSoda comparten camsoda.com, sin ser duplicados).
+    """
+    densidad = np.bincount(inv_titulo)[inv_titulo].astype(np.float64)
+
+    if sitios.any():
+        cnt_dominio = np.bincount(inv_dominio[sitios], minlength=inv_dominio.max() + 1)
+        densidad[sitios] = np.maximum(densidad[sitios], cnt_dominio[inv_dominio[sitios]])
+    return 1.0 / densidad
+
+# ============================================
+# API PRINCIPAL
+# ============================================
+
+def calcular_features(datos: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Calcula cada feature (0-1) para todo el set en una sola pasada. El texto
+    (normalización, dominios, regex) se procesa con kernels de pyarrow.compute
+    en lugar de un loop Python por fila.
+    """
+    if pc is None:
+        raise ImportError("calcular_features necesita pyarrow")
+    titulos = pc.utf8_trim_whitespace(pa.array([d.get("title") or "" for d in datos], type=pa.string()))
+    normalizados = _normalizar(titulos)
+    # Para el dominio se prefiere el destino resuelto (affiliate_url) sobre el redirect
+    urls = pa.array([d.get("affiliate_url") or d.get("source_url") or "" for d in datos], type=pa.string())
+    dominios = _dominios(urls, _hosts(urls))
+    largos = _a_numpy(pc.utf8_length(titulos)).astype(np.float64)
+
+    # Índices de diccionario = inverso de np.unique, sin ordenar strings en Python
+    cod_titulo = pc.dictionary_encode(normalizados)
+    cod_dominio = pc.dictionary_encode(dominios)
+    inv_dominio = _a_numpy(cod_dominio.indices)
+    dominios_unicos = cod_dominio.dictionary.to_pylist()
+
+    # Home de un dominio destino real (no agregador ni subpágina)
+    reales = np.array([bool(d) and d not in DOMINIOS_AGREGADORES for d in dominios_unicos], dtype=bool)
+    home = _a_numpy(pc.match_substring_regex(urls, REGEX_HOME))
+    sitios = reales[inv_dominio] & home
+
+    return {
+        "titulo_largo": _score_largo_titulo(largos),
+        "titulo_calidad": _score_calidad_titulo(titulos, normalizados, largos),
+        "imagen": _score_imagen(pa.array([d.get("image_url") or "" for d in datos], type=pa.string())),
+        "dominio": _score_dominio(dominios_unicos, inv_dominio),
+        "unicidad": _score_unicidad(_a_numpy(cod_titulo.indices), inv_dominio, sitios),
+    }
+
+def calcular_quality_scores(datos: List[Dict[str, Any]]) -> np.ndarray:
+    """Vector de quality_score (int 0-100) alineado con `datos`"""
+    if not datos:
+        return np.zeros(0, dtype=np.int64)
+    features = calcular_features(datos)
+    total = sum(features[k] * peso for k, peso in PESOS.items())
+    return np.clip(np.rint(total), 0, 100).astype(np.int64)
+
+def aplicar_quality_scores(datos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Agrega quality_score y rating derivado (1.0-5.0) a cada registro, in-place"""
+    scores = calcular_quality_scores(datos)
+    ratings = np.round(1.0 + scores / 25.0, 1)
+    for d, score, rating in zip(datos, scores.tolist(), ratings.tolist()):
+        d["quality_score"] = score
+        d["rating"] = rating
+    return datos
@@ -132,8 +132,12 @@ class PornDudeScraper:
             'Accept-Language': 'en-US,en;q=0.9'
         }
 
-    def resolve_final_url(self, url: str) -> str:
-        """Sigue redirecciones para obtener el dominio final real"""
+    def resolve_final_url(self, url: str, estricto: bool = False) -> str:
+        """
+        Sigue redirecciones para obtener el dominio final real.
+        Con estricto=True un error de red o un status de error en PornDude se
+        propagan en lugar de devolver la URL original (la cola los reintenta).
+        """
         if not url or 'theporndude.com' not in url:
             return url
             
@@ -147,6 +151,8 @@ class PornDudeScraper:
             if 'theporndude.com' in final_url:
                 r = requests.get(url, headers=self.headers, timeout=10, allow_redirects=True, stream=True)
                 final_url = r.url
+                if estricto:
+                    r.raise_for_status()
             
             from urllib.parse import urlparse
             parsed = urlparse(final_url)
@@ -157,6 +163,8 @@ class PornDudeScraper:
                 
             return url
         except Exception as e:
+            if estricto:
+                raise
             logging.warning(f"⚠️ Error resolviendo {url}: {e}")
             return url
     
@@ -349,6 +357,9 @@ def insertar_en_supabase(datos: List[Dict]):
                 "likes": 0,
                 "views": 0
             }
+            # Sin score (scoring falló) se deja el default de la DB
+            if "quality_score" in d:
+                item["quality_score"] = d["quality_score"]
             datos_insert.append(item)
 
         # Batch insert
@@ -418,6 +429,22 @@ def main():
     # Si teníamos datos previos guardados, cargarlos para el final
     # (Simplificado para este run)
     
+    # Validar image_url (Range requests concurrentes + cache con TTL)
+    try:
+        from image_probe import validar_imagenes
+        stats = validar_imagenes(all_data)
+        logging.info(f"🖼️ Imágenes OK: {stats['ok']}, rotas: {stats['rotas']} (reemplazadas: {stats['reemplazadas']}), transitorias: {stats['transitorias']}, placeholder: {stats['placeholder']}")
+    except Exception as e:
+        logging.error(f"⚠️ Probe de imágenes falló ({e}), se suben las URLs sin validar")
+    
+    # Quality score en batch antes de guardar/insertar
+    try:
+        from quality_score import aplicar_quality_scores
+        aplicar_quality_scores(all_data)
+        logging.info("⭐ Quality scores calculados")
+    except Exception as e:
+        logging.error(f"⚠️ Scoring falló ({e}), usando default de la DB")
+    
     try:
         with open(FINAL_FILE, 'w', encoding='utf-8') as f:
             json.dump(all_data, f, indent=2, ensure_ascii=False)
@@ -425,6 +452,13 @@ def main():
     except Exception as e:
         logging.error(f"Error guardando final data: {e}")
     
+    # Append al catálogo columnar (Parquet particionado por fecha/fuente)
+    try:
+        from columnar_export import exportar_run
+        logging.info(f"🗄️ Catálogo Parquet: {exportar_run(all_data)} registros agregados")
+    except Exception as e:
+        logging.error(f"⚠️ Export Parquet falló ({e})")
+    
     # 6. Reporte final
     reporte_progreso(checkpoint)
     
@@ -12,6 +12,7 @@ from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 
 SCRAPE_DATA_DIR = r"C:\Users\pablo\Downloads\VENUZ-Complete-App\venuz-app\scrape-data"
+NEAR_DEDUP_INDEX = os.path.join(SCRAPE_DATA_DIR, "near_dedup_index.npz")
 os.makedirs(SCRAPE_DATA_DIR, exist_ok=True)
 
 async def scrape_porndude_live():
@@ -169,15 +170,60 @@ async def scrape_porndude_live():
             await browser.close()
             return []
 
+# Categorías de PornDude (url, categoría)
+CATEGORIAS_PORNDUDE = [
+    ('https://www.theporndude.com/', 'general'),
+    ('https://www.theporndude.com/best-porn-sites', 'tubes'),
+]
+
+async def cargar_pagina(page, url):
+    """Navega a `url`, hace scroll para el lazy content y devuelve el HTML"""
+    await page.goto(url, wait_until='networkidle', timeout=30000)
+    await page.wait_for_timeout(2000)
+    
+    # Scroll
+    for _ in range(5):
+        await page.evaluate('window.scrollBy(0, 800)')
+        await page.wait_for_timeout(300)
+    
+    return await page.content()
+
+def extraer_sitios(html, cat_name):
+    """Extrae los sitios (links /go/ y /out/) de una página de listado"""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Buscar links
+    links = soup.find_all('a', href=True)
+    seen = set()
+    datos = []
+    
+    for link in links:
+        href = link.get('href', '')
+        if '/go/' in href or '/out/' in href:
+            if href not in seen:
+                seen.add(href)
+                title = link.get_text(strip=True) or 'Adult Site'
+                if len(title) > 2 and len(title) < 100:
+                    datos.append({
+                        "title": title,
+                        "description": f"Explore {title}",
+                        "image_url": "https://images.unsplash.com/photo-1557682250-33bd709cbe85?w=800",
+                        "source_url": href,
+                        "affiliate_url": href,
+                        "affiliate_source": "porndude",
+                        "category": cat_name,
+                        "location": "Online",
+                        "is_verified": True,
+                        "active": True,
+                        "created_at": datetime.now().isoformat()
+                    })
+    
+    return datos
+
 async def scrape_multiple_categories():
     """Scrape múltiples categorías de PornDude"""
     print("🚀 Iniciando scrape multi-categoría...")
     
-    categories = [
-        ('https://www.theporndude.com/', 'general'),
-        ('https://www.theporndude.com/best-porn-sites', 'tubes'),
-    ]
-    
     all_data = []
     
     async with async_playwright() as p:
@@ -187,46 +233,14 @@ async def scrape_multiple_categories():
         )
         page = await context.new_page()
         
-        for url, cat_name in categories:
+        for url, cat_name in CATEGORIAS_PORNDUDE:
             print(f"\n📍 Scrapeando: {cat_name}")
             try:
-                await page.goto(url, wait_until='networkidle', timeout=30000)
-                await page.wait_for_timeout(2000)
-                
-                # Scroll
-                for _ in range(5):
-                    await page.evaluate('window.scrollBy(0, 800)')
-                    await page.wait_for_timeout(300)
+                html = await cargar_pagina(page, url)
+                sitios = extraer_sitios(html, cat_name)
+                all_data.extend(sitios)
                 
-                html = await page.content()
-                soup = BeautifulSoup(html, 'html.parser')
-                
-                # Buscar links
-                links = soup.find_all('a', href=True)
-                seen = set()
-                
-                for link in links:
-                    href = link.get('href', '')
-                    if '/go/' in href or '/out/' in href:
-                        if href not in seen:
-                            seen.add(href)
-                            title = link.get_text(strip=True) or 'Adult Site'
-                            if len(title) > 2 and len(title) < 100:
-                                all_data.append({
-                                    "title": title,
-                                    "description": f"Explore {title}",
-                                    "image_url": "https://images.unsplash.com/photo-1557682250-33bd709cbe85?w=800",
-                                    "source_url": href,
-                                    "affiliate_url": href,
-                                    "affiliate_source": "porndude",
-                                    "category": cat_name,
-                                    "location": "Online",
-                                    "is_verified": True,
-                                    "active": True,
-                                    "created_at": datetime.now().isoformat()
-                                })
-                
-                print(f"   ✅ {len(seen)} sitios encontrados en {cat_name}")
+                print(f"   ✅ {len(sitios)} sitios encontrados en {cat_name}")
                 
             except Exception as e:
                 print(f"   ⚠️ Error en {cat_name}: {e}")
@@ -236,7 +250,7 @@ async def scrape_multiple_categories():
     return all_data
 
 def insertar_en_supabase(datos):
-    """Insertar datos en Supabase"""
+    """Insertar datos en Supabase. True solo si todos los batches se insertaron"""
     try:
         from supabase import create_client
         import os
@@ -255,7 +269,7 @@ def insertar_en_supabase(datos):
         # Preparar datos
         datos_insert = []
         for d in datos:
-            datos_insert.append({
+            item = {
                 "title": d["title"],
                 "description": d["description"],
                 "image_url": d["image_url"],
@@ -266,7 +280,12 @@ def insertar_en_supabase(datos):
                 "location": d.get("location", "Online"),
                 "is_verified": d.get("is_verified", True),
                 "active": d.get("active", True),
-            })
+            }
+            # Sin score (scoring falló) no se mandan: el upsert pisaría los valores de la DB
+            if "quality_score" in d:
+                item["quality_score"] = d["quality_score"]
+                item["rating"] = d.get("rating")
+            datos_insert.append(item)
         
         # Batch insert (evitando duplicados)
         batch_size = 50
@@ -281,12 +300,79 @@ def insertar_en_supabase(datos):
                 print(f"   ⚠️ Error batch: {e}")
         
         print(f"✅ Total insertados: {inserted}")
-        return True
+        return inserted == len(datos_insert)
         
     except Exception as e:
         print(f"❌ Error Supabase: {e}")
         return False
 
+def cargar_indice_near():
+    """Índice MinHash persistido (vacío si no existe o está corrupto); None si near_dedup no está disponible"""
+    try:
+        from near_dedup import LSHIndex
+    except Exception as e:
+        print(f"⚠️ Dedup MinHash no disponible ({e}), solo dedup exacto")
+        return None
+    try:
+        return LSHIndex.cargar(NEAR_DEDUP_INDEX)
+    except Exception as e:
+        # Índice corrupto: arrancar uno nuevo (se sobreescribe al guardar)
+        print(f"⚠️ Índice MinHash ilegible ({e}), iniciando vacío")
+        return LSHIndex()
+
+def procesar_lote(datos, index=None, guardar_indice=True):
+    """
+    Etapas opcionales antes del upsert: probe de imágenes -> casi-duplicados -> quality score.
+    Compartido por main() y los workers de work_queue.py. Los workers pasan su
+    índice MinHash en memoria (cargado una vez por proceso) con guardar_indice=False:
+    varios procesos no pueden escribir el mismo .npz, lo actualiza el padre al final.
+    """
+    # Validar image_url (Range requests concurrentes + cache con TTL)
+    try:
+        from image_probe import validar_imagenes
+        stats = validar_imagenes(datos)
+        print(f"🖼️ Imágenes OK: {stats['ok']}, rotas: {stats['rotas']} (reemplazadas: {stats['reemplazadas']}), transitorias: {stats['transitorias']}, placeholder: {stats['placeholder']}")
+    except Exception as e:
+        print(f"⚠️ Probe de imágenes falló ({e}), se suben las URLs sin validar")
+    
+    # Casi-duplicados (mismo sitio con otro redirect/categoría/título)
+    if index is None:
+        index = cargar_indice_near()
+    if index is not None:
+        try:
+            from near_dedup import deduplicar_near
+            datos, n_dupes = deduplicar_near(datos, index, politica="fusionar")
+            if guardar_indice:
+                index.guardar(NEAR_DEDUP_INDEX)
+            print(f"🧬 Casi-duplicados fusionados: {n_dupes} (quedan {len(datos)}, índice: {len(index)})")
+        except Exception as e:
+            print(f"⚠️ Dedup MinHash falló ({e}), solo dedup exacto")
+    
+    # Calcular quality_score en batch sobre los sobrevivientes (viaja en el mismo upsert)
+    try:
+        from quality_score import aplicar_quality_scores
+        aplicar_quality_scores(datos)
+        print("⭐ Quality scores calculados")
+    except Exception as e:
+        print(f"⚠️ Scoring falló ({e}), usando default de la DB")
+    
+    return datos
+
+def exportar_catalogo(datos, run_id=None, run_date=None):
+    """Append al catálogo columnar (Parquet particionado por fecha/fuente); nunca corta el upload"""
+    try:
+        from columnar_export import exportar_run
+        print(f"🗄️ Catálogo Parquet: {exportar_run(datos, run_date=run_date, run_id=run_id)} registros agregados")
+    except Exception as e:
+        print(f"⚠️ Export Parquet falló ({e})")
+
+def guardar_json(datos):
+    """Snapshot JSON del último scrape (el mismo archivo que usa main())"""
+    output_file = os.path.join(SCRAPE_DATA_DIR, "PORNDUDE_SCRAPED.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    print(f"💾 Guardado: {output_file}")
+
 async def main():
     print("="*60)
     print("🚀 ANTIGRAVITY PLAYWRIGHT SCRAPER")
@@ -311,11 +397,13 @@ async def main():
     
     print(f"\n📊 Total sitios únicos: {len(unique_datos)}")
     
+    # Probe de imágenes, casi-duplicados y quality score
+    unique_datos = procesar_lote(unique_datos)
+    
     # Guardar JSON
-    output_file = os.path.join(SCRAPE_DATA_DIR, "PORNDUDE_SCRAPED.json")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(unique_datos, f, indent=2, ensure_ascii=False)
-    print(f"💾 Guardado: {output_file}")
+    guardar_json(unique_datos)
+    
+    exportar_catalogo(unique_datos)
     
     # Insertar en Supabase
     if unique_datos:
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# work_queue.py - COLA DE TRABAJO LOCAL (SQLite) PARA CRAWLING MULTI-PROCESO
+# Seeds, páginas de listado y resolución de redirects viven como tareas en una
+# cola SQLite con leases, reintentos y prioridades. Varios workers (procesos)
+# reclaman tareas en paralelo y reusan la extracción/inserción de scraper_playwright.
+# Si un worker muere, su lease expira y otro worker vuelve a tomar sus tareas.
+# Los registros procesados quedan en la misma DB; al terminar, el proceso padre
+# los exporta una sola vez (JSON + Parquet) y los agrega al índice MinHash.
+#
+# Uso:
+#   python scripts/work_queue.py seed            # encolar categorías de PornDude
+#   python scripts/work_queue.py workers 4       # lanzar 4 workers hasta vaciar la cola
+#   python scripts/work_queue.py stats           # estado de la cola
+
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+sys.stderr.reconfigure(encoding='utf-8')
+
+import os
+import json
+import time
+import socket
+import asyncio
+import sqlite3
+import multiprocessing
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+from typing import List, Dict, Any, Optional
+
+# ============================================
+# CONFIGURACION
+# ============================================
+
+SCRAPE_DATA_DIR = r"C:\Users\pablo\Downloads\VENUZ-Complete-App\venuz-app\scrape-data"
+QUEUE_DB = os.path.join(SCRAPE_DATA_DIR, "work_queue.db")
+
+LEASE_SEGUNDOS = 120        # Un worker que no termina en este tiempo se considera caído
+MAX_INTENTOS = 3
+BACKOFF_BASE = 5            # Segundos; se duplica en cada reintento
+ESPERA_VACIA = 2            # Pausa cuando no hay tareas disponibles pero sí leases activos
+BATCH_INSERT = 50
+MAX_PROFUNDIDAD = 1         # seed (0) -> listados (1)
+MAX_LISTADOS_POR_SEED = 50
+
+# Mayor prioridad = se toma primero. Los redirects cierran registros, van antes.
+PRIORIDADES = {
+    "redirect": 10,
+    "listado": 5,
+    "seed": 1,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tareas (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo          TEXT    NOT NULL,
+    url           TEXT    NOT NULL,
+    payload       TEXT    NOT NULL DEFAULT '{}',
+    prioridad     INTEGER NOT NULL DEFAULT 0,
+    estado        TEXT    NOT NULL DEFAULT 'pendiente',  -- pendiente | en_proceso | hecha | fallida
+    intentos      INTEGER NOT NULL DEFAULT 0,
+    max_intentos  INTEGER NOT NULL DEFAULT 3,
+    disponible_en REAL    NOT NULL DEFAULT 0,
+    lease_hasta   REAL,
+    worker        TEXT,
+    error         TEXT,
+    creada_en     REAL    NOT NULL,
+    actualizada_en REAL   NOT NULL,
+    UNIQUE (tipo, url)
+);
+CREATE INDEX IF NOT EXISTS idx_tareas_claim ON tareas (estado, prioridad DESC, disponible_en);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    source_url     TEXT PRIMARY KEY,
+    record         TEXT NOT NULL,
+    crawl          REAL NOT NULL,   -- crawl_inicio del crawl que lo procesó
+    actualizada_en REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resultados_crawl ON resultados (crawl);
+"""
+
+# ============================================
+# COLA
+# ============================================
+
+class WorkQueue:
+    """Cola de tareas sobre SQLite (WAL), segura entre procesos"""
+
+    def __init__(self, path: str = QUEUE_DB, lease_segundos: int = LEASE_SEGUNDOS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lease_segundos = lease_segundos
+        # isolation_level=None: manejamos las transacciones a mano (BEGIN IMMEDIATE)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def iniciar_crawl(self) -> float:
+        """Marca el inicio de un crawl: las tareas terminadas antes se pueden re-encolar"""
+        ahora = time.time()
+        self.conn.execute(
+            "INSERT INTO meta (clave, valor) VALUES ('crawl_inicio', ?) "
+            "ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor",
+            (str(ahora),),
+        )
+        return ahora
+
+    def crawl_inicio(self) -> float:
+        """Timestamp del crawl en curso (0 si nunca se encolaron seeds)"""
+        fila = self.conn.execute("SELECT valor FROM meta WHERE clave = 'crawl_inicio'").fetchone()
+        return float(fila["valor"]) if fila else 0.0
+
+    def guardar_resultados(self, datos: List[Dict[str, Any]]):
+        """Registros ya procesados del crawl en curso (upsert por source_url)"""
+        ahora = time.time()
+        crawl = self.crawl_inicio()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                """INSERT INTO resultados (source_url, record, crawl, actualizada_en) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(source_url) DO UPDATE SET
+                       record = excluded.record, crawl = excluded.crawl, actualizada_en = excluded.actualizada_en""",
+                [(d["source_url"], json.dumps(d, ensure_ascii=False), crawl, ahora) for d in datos],
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def resultados(self) -> List[Dict[str, Any]]:
+        """Registros procesados en el crawl en curso"""
+        filas = self.conn.execute(
+            "SELECT record FROM resultados WHERE crawl = ? ORDER BY actualizada_en", (self.crawl_inicio(),)
+        )
+        return [json.loads(f["record"]) for f in filas]
+
+    def encolar(self, tipo: str, url: str, payload: Optional[Dict[str, Any]] = None,
+                prioridad: Optional[int] = None, max_intentos: int = MAX_INTENTOS) -> bool:
+        """
+        Agrega una tarea. Si ya existía (tipo, url) y terminó (hecha/fallida) en un
+        crawl anterior, se re-arma como pendiente; dentro del mismo crawl no se repite.
+        False si no hubo cambios.
+        """
+        ahora = time.time()
+        cur = self.conn.execute(
+            """INSERT INTO tareas
+               (tipo, url, payload, prioridad, max_intentos, creada_en, actualizada_en)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(tipo, url) DO UPDATE SET
+                   estado = 'pendiente', intentos = 0, disponible_en = 0,
+                   lease_hasta = NULL, worker = NULL, error = NULL,
+                   payload = excluded.payload, prioridad = excluded.prioridad,
+                   max_intentos = excluded.max_intentos, actualizada_en = excluded.actualizada_en
+               WHERE tareas.estado IN ('hecha', 'fallida')
+                 AND tareas.actualizada_en < (SELECT CAST(valor AS REAL) FROM meta WHERE clave = 'crawl_inicio')""",
+            (tipo, url, json.dumps(payload or {}, ensure_ascii=False),
+             PRIORIDADES.get(tipo, 0) if prioridad is None else prioridad,
+             max_intentos, ahora, ahora),
+        )
+        return cur.rowcount > 0
+
+    def reclamar(self, worker: str, limite: int = 1) -> List[sqlite3.Row]:
+        """
+        Toma hasta `limite` tareas con lease. Son reclamables las pendientes
+        disponibles y las en_proceso con lease vencido (worker caído).
+        """
+        ahora = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Leases vencidos que ya agotaron intentos -> fallida
+            self.conn.execute(
+                """UPDATE tareas SET estado = 'fallida', error = 'lease vencido', actualizada_en = ?
+                   WHERE estado = 'en_proceso' AND lease_hasta < ? AND intentos >= max_intentos""",
+                (ahora, ahora),
+            )
+            filas = self.conn.execute(
+                """SELECT id FROM tareas
+                   WHERE (estado = 'pendiente' AND disponible_en <= ?)
+                      OR (estado = 'en_proceso' AND lease_hasta < ?)
+                   ORDER BY prioridad DESC, id
+                   LIMIT ?""",
+                (ahora, ahora, limite),
+            ).fetchall()
+            ids = [f["id"] for f in filas]
+            if ids:
+                marcas = ",".join("?" * len(ids))
+                self.conn.execute(
+                    f"""UPDATE tareas
+                        SET estado = 'en_proceso', intentos = intentos + 1,
+                            lease_hasta = ?, worker = ?, actualizada_en = ?
+                        WHERE id IN ({marcas})""",
+                    (ahora + self.lease_segundos, worker, ahora, *ids),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        if not ids:
+            return []
+        marcas = ",".join("?" * len(ids))
+        return self.conn.execute(
+            f"SELECT * FROM tareas WHERE id IN ({marcas}) ORDER BY prioridad DESC, id", ids
+        ).fetchall()
+
+    def completar(self, tarea_id: int):
+        self.conn.execute(
+            "UPDATE tareas SET estado = 'hecha', lease_hasta = NULL, error = NULL, actualizada_en = ? WHERE id = ?",
+            (time.time(), tarea_id),
+        )
+
+    def fallar(self, tarea: sqlite3.Row, error: str):
+        """Reintenta con backoff exponencial o marca como fallida si agotó intentos"""
+        ahora = time.time()
+        if tarea["intentos"] >= tarea["max_intentos"]:
+            estado, disponible = "fallida", ahora
+        else:
+            estado, disponible = "pendiente", ahora + BACKOFF_BASE * 2 ** (tarea["intentos"] - 1)
+        self.conn.execute(
+            """UPDATE tareas SET estado = ?, disponible_en = ?, lease_hasta = NULL,
+                   error = ?, actualizada_en = ?
+               WHERE id = ?""",
+            (estado, disponible, error[:500], ahora, tarea["id"]),
+        )
+
+    def hay_activas(self) -> bool:
+        """True si queda algo pendiente o en proceso (aunque no sea reclamable ahora)"""
+        fila = self.conn.execute(
+            "SELECT 1 FROM tareas WHERE estado IN ('pendiente', 'en_proceso') LIMIT 1"
+        ).fetchone()
+        return fila is not None
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Conteo por tipo y estado"""
+        resultado: Dict[str, Dict[str, int]] = {}
+        for fila in self.conn.execute("SELECT tipo, estado, COUNT(*) AS n FROM tareas GROUP BY tipo, estado"):
+            resultado.setdefault(fila["tipo"], {})[fila["estado"]] = fila["n"]
+        return resultado
+
+# ============================================
+# HANDLERS
+# ============================================
+
+def _links_de_listado(html: str, base_url: str) -> List[str]:
+    """Links internos (mismo dominio, no redirects) para encolar como listados"""
+    from bs4 import BeautifulSoup
+
+    host = urlparse(base_url).netloc
+    links = []
+    for a in BeautifulSoup(html, 'html.parser').find_all('a', href=True):
+        url = urljoin(base_url, a['href']).split('#')[0]
+        if urlparse(url).netloc != host or any(x in url for x in ['/go/', '/out/']):
+            continue
+        if url not in links and url != base_url:
+            links.append(url)
+        if len(links) >= MAX_LISTADOS_POR_SEED:
+            break
+    return links
+
+async def _procesar_pagina(queue: WorkQueue, page, tarea: sqlite3.Row):
+    """seed/listado: cargar con Playwright, extraer sitios y encolar sus redirects"""
+    from scraper_playwright import cargar_pagina, extraer_sitios
+
+    payload = json.loads(tarea["payload"])
+    categoria = payload.get("categoria", "general")
+    profundidad = payload.get("profundidad", 0)
+
+    html = await cargar_pagina(page, tarea["url"])
+    sitios = extraer_sitios(html, categoria)
+    for sitio in sitios:
+        queue.encolar("redirect", sitio["source_url"], {"record": sitio})
+
+    if tarea["tipo"] == "seed" and profundidad < MAX_PROFUNDIDAD:
+        for url in _links_de_listado(html, tarea["url"]):
+            queue.encolar("listado", url, {"categoria": categoria, "profundidad": profundidad + 1})
+
+    print(f"   ✅ [{tarea['tipo']}] {tarea['url']}: {len(sitios)} sitios")
+
+def _resolver_redirect(tarea: sqlite3.Row, resolver) -> Dict[str, Any]:
+    """
+    redirect: seguir el link de afiliado hasta el dominio real. Un timeout, error
+    de DNS o 5xx se propaga para que la tarea vuelva a la cola con backoff.
+    """
+    record = json.loads(tarea["payload"])["record"]
+    record["affiliate_url"] = resolver.resolve_final_url(tarea["url"], estricto=True)
+    return record
+
+# ============================================
+# WORKER
+# ============================================
+
+def _flush(queue: WorkQueue, buffer: List[Dict[str, Any]], tareas: List[sqlite3.Row], index=None):
+    """
+    Mismo pipeline que main() sobre los registros resueltos: procesar_lote
+    (probe, casi-duplicados, score) -> guardar resultado -> upsert. El índice
+    MinHash es el del worker (en memoria): deduplica contra runs previos y contra
+    lo que este worker ya procesó, no contra los otros workers del crawl.
+    El export JSON/Parquet se hace una vez al final (ver cerrar_crawl).
+    """
+    if buffer:
+        from scraper_playwright import procesar_lote, insertar_en_supabase
+        lote = procesar_lote(list(buffer), index=index, guardar_indice=False)
+        # Como main(): el resultado se guarda antes del upsert, se suba o no
+        queue.guardar_resultados(lote)
+        # Los redirects se completan recién después de un upsert exitoso; si falla
+        # vuelven a la cola con backoff, y si el worker muere el lease vence
+        if not insertar_en_supabase(lote):
+            for tarea in tareas:
+                queue.fallar(tarea, "upsert fallido")
+            buffer.clear()
+            tareas.clear()
+            return
+    for tarea in tareas:
+        queue.completar(tarea["id"])
+    buffer.clear()
+    tareas.clear()
+
+async def _worker_loop(path: str, nombre: str):
+    from playwright.async_api import async_playwright
+    from scraper import PornDudeScraper
+    from scraper_playwright import cargar_indice_near
+
+    queue = WorkQueue(path)
+    resolver = PornDudeScraper()
+    # Una sola carga por proceso; lo que agrega este worker queda en memoria
+    index = cargar_indice_near()
+    buffer: List[Dict[str, Any]] = []
+    tareas_buffer: List[sqlite3.Row] = []
+    primer_buffer = 0.0
+    procesadas = 0
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context(
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        )
+        page = await context.new_page()
+
+        while True:
+            tareas = queue.reclamar(nombre)
+            if not tareas:
+                # Sin trabajo a mano: liberar el buffer (sus redirects siguen en_proceso)
+                _flush(queue, buffer, tareas_buffer, index)
+                if not queue.hay_activas():
+                    break
+                # Otros workers tienen leases activos: pueden encolar más trabajo
+                await asyncio.sleep(ESPERA_VACIA)
+                continue
+
+            for tarea in tareas:
+                try:
+                    if tarea["tipo"] == "redirect":
+                        # requests es bloqueante: fuera del event loop
+                        record = await asyncio.to_thread(_resolver_redirect, tarea, resolver)
+                        if not buffer:
+                            primer_buffer = time.time()
+                        buffer.append(record)
+                        tareas_buffer.append(tarea)
+                    else:
+                        await _procesar_pagina(queue, page, tarea)
+                        queue.completar(tarea["id"])
+                    procesadas += 1
+                except Exception as e:
+                    print(f"   ⚠️ [{nombre}] Error en {tarea['tipo']} {tarea['url']}: {e}")
+                    queue.fallar(tarea, str(e))
+
+            # Flush por tamaño o antes de que venzan los leases del buffer
+            if len(buffer) >= BATCH_INSERT or (buffer and time.time() - primer_buffer > queue.lease_segundos / 2):
+                _flush(queue, buffer, tareas_buffer, index)
+
+        await browser.close()
+
+    _flush(queue, buffer, tareas_buffer, index)
+    queue.close()
+    print(f"🏁 [{nombre}] Terminado: {procesadas} tareas")
+
+def run_worker(path: str = QUEUE_DB, indice: int = 0):
+    """Entry point de cada proceso worker"""
+    nombre = f"{socket.gethostname()}-{os.getpid()}-{indice}"
+    print(f"👷 Worker {nombre} iniciado")
+    asyncio.run(_worker_loop(path, nombre))
+
+def lanzar_workers(n: int, path: str = QUEUE_DB):
+    """Lanza `n` procesos worker y espera a que vacíen la cola"""
+    procesos = [
+        multiprocessing.Process(target=run_worker, args=(path, i), name=f"worker-{i}")
+        for i in range(n)
+    ]
+    for proc in procesos:
+        proc.start()
+    for proc in procesos:
+        proc.join()
+    cerrar_crawl(path)
+
+def cerrar_crawl(path: str = QUEUE_DB) -> int:
+    """
+    Cierre en el proceso padre sobre los resultados del crawl: JSON, un solo export
+    Parquet con run_id del crawl (re-ejecutarlo sobreescribe los mismos archivos) y
+    alta en el índice MinHash, que los workers solo leen.
+    """
+    from scraper_playwright import guardar_json, exportar_catalogo, cargar_indice_near, NEAR_DEDUP_INDEX
+
+    queue = WorkQueue(path)
+    inicio = queue.crawl_inicio()
+    datos = queue.resultados()
+    queue.close()
+    if not datos:
+        return 0
+
+    print(f"\n📦 Cerrando crawl: {len(datos)} registros")
+    guardar_json(datos)
+    crawl = datetime.fromtimestamp(inicio)
+    exportar_catalogo(datos, run_id=f"crawl-{crawl:%Y%m%dT%H%M%S}", run_date=crawl.date().isoformat())
+
+    index = cargar_indice_near()
+    if index is not None:
+        try:
+            from near_dedup import indexar
+            nuevos = indexar(datos, index)
+            index.guardar(NEAR_DEDUP_INDEX)
+            print(f"🧬 Índice MinHash: {nuevos} nuevos (total {len(index)})")
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar el índice MinHash ({e})")
+    return len(datos)
+
+def encolar_seeds(path: str = QUEUE_DB) -> int:
+    """Inicia un crawl nuevo y encola las categorías de PornDude como seeds"""
+    from scraper_playwright import CATEGORIAS_PORNDUDE
+
+    queue = WorkQueue(path)
+    queue.iniciar_crawl()
+    nuevas = sum(
+        queue.encolar("seed", url, {"categoria": cat_name, "profundidad": 0})
+        for url, cat_name in CATEGORIAS_PORNDUDE
+    )
+    queue.close()
+    return nuevas
+
+# ============================================
+# MAIN EXECUTION
+# ============================================
+
+def main():
+    comando = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if comando == "seed":
+        print(f"🌱 Seeds encolados: {encolar_seeds()}")
+    elif comando == "workers":
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+        print(f"🚀 Lanzando {n} workers sobre {QUEUE_DB}")
+        lanzar_workers(n)
+    elif comando != "stats":
+        print(f"❌ Comando desconocido: {comando} (seed | workers N | stats)")
+        return
+
+    queue = WorkQueue()
+    print("\n📊 ESTADO DE LA COLA")
+    for tipo, estados in queue.stats().items():
+        print(f"   {tipo}: {estados}")
+    queue.close()
+
+if __name__ == "__main__":
+    main()